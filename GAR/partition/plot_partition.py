@@ -12,23 +12,33 @@ Editted by cwang2@imf.org
 #import os, sys, importlib                             ## Operating system
 import pandas as pd                                   ## Dataframes
 import numpy as np                                    ## Numeric tools
-import matplotlib.pyplot as plt                       ## Plotting
-import seaborn as sns                                 ## Plotting
 from matplotlib import gridspec   
 
 ###############################################################################
 #%% Plotting
 ###############################################################################
-## Style of the charts
-plt.style.use('seaborn-white')
+## pyplot and the style of the charts are loaded on the first call of
+## partition_plot. Note that other step modules (tsfit, scenario,
+## historical, segment) still import pyplot when the GAR package is imported.
+_STYLE_SET = False
 
 def zscore(series):
     return((series - series.mean())/series.std(ddof=0))
 
+def truncate_labels(labels, maxlen=10):
+    ''' Shorten the labels longer than maxlen to their first 7 characters + ... '''
+    labels = pd.Series(labels).reset_index(drop=True)
+    return labels.where(labels.str.len()<=maxlen, labels.str.slice(0,7)+'...').values
+
 ###############################################################################
 #%% Partition plot
 ###############################################################################
 def partition_plot(dall,ddatac,dload,group_list,PLStarget,depvar,method):
+    global _STYLE_SET
+    import matplotlib.pyplot as plt                   ## Plotting
+    if not _STYLE_SET:
+        plt.style.use('seaborn-white')
+        _STYLE_SET = True
     plt.close('all')
 
     if method=='PLS':
@@ -88,116 +98,62 @@ def partition_plot(dall,ddatac,dload,group_list,PLStarget,depvar,method):
         ddatac = ddatac.set_index(ddatac.date) 
         group_list.sort()
         cr=len(group_list)
-        fig, axes = plt.subplots(nrows= 3, ncols=len(group_list), figsize=(11*cr,45))
+        # squeeze=False keeps axes 2D, also when there is a single group
+        fig, axes = plt.subplots(nrows= 3, ncols=len(group_list), figsize=(11*max(cr,1),45), squeeze=False)
+
+        # Normalized loadings of all the groups in one pass, then split
+        # by group with the loadings sorted in decreasing order
+        dnorm = dload.copy()
+        sum_abs = dnorm['loadings'].abs().groupby(dnorm['group']).transform('sum')
+        dnorm['norm_loadings'] = dnorm['loadings']/sum_abs
+        dnorm = dnorm.sort_values(by=['loadings'], ascending=[0])
+        dl1_by_group = {group: dl1 for group, dl1 in dnorm.groupby('group', sort=False)}
+
+        for g, group in enumerate(group_list):
+
+            group_label = group
         
-        if len(group_list)>1:
-            for g, group in enumerate(group_list):
-    
-                group_label = group
-            
-            ## Upper plot
-                ddatac.loc[:,group].plot(ax=axes[0,g])
-                axes[0,g].axhline(y=0, c='black', linewidth=0.7)
-                axes[0,g].set_title('{} over time'.format(group_label),
-                                fontsize=30, y=1.05)
-                axes[0,g].set_xlabel('')
-                axes[0,g].tick_params(labelsize=18)
-                plt.setp(axes[0,g].xaxis.get_majorticklabels(), rotation=70 )
-                  
-            ## Middle plot
-                dl1 = dload[dload.group==group]
-                dl1['loadings'] = dl1['loadings'] # Now remove absolute
-                dl1 = dl1.sort_values(by=['loadings'], ascending=[0])
-                sum_abs = np.sum(np.absolute(dl1.loadings))
-                dl1['norm_loadings'] = dl1['loadings']/sum_abs
-                x_arr = dl1.norm_loadings.values
-                y_arr = np.arange(len(dl1.variable))
-                axes[1,g].hlines(y_arr, 0, x_arr, color='red')  # Stems
-                axes[1,g].plot(x_arr, y_arr, 'D')  # Stem ends
-                axes[1,g].plot([0, 0], [y_arr.min(), y_arr.max()], '--')  # Middle bar
-                axes[1,g].set_yticks(range(len(dl1.variable.values)))
-                ytick=dl1.variable.values
-                for ind in range(len(ytick)):
-                    if len(ytick[ind])>10:
-                        ytick[ind]=ytick[ind][0:7]+'...'
-                axes[1,g].set_yticklabels(ytick)
-                axes[1,g].set_title('Loadings: {}'.format(group_label), fontsize=30)
-                axes[1,g].tick_params(labelsize=25)
-            ## Increase size to avoid chart to disappear
-                ymin, ymax = axes[1,g].get_ylim()
-                axes[1,g].set_ylim([ymin-0.5,ymax+0.5])
-                
-                
-            ## Buttom plot
-                x_arr = [abs(e) for e in dl1.norm_loadings.values]
-                y_arr = np.arange(len(dl1.variable))
-                axes[2,g].hlines(y_arr, 0, x_arr, color='red')  # Stems
-                axes[2,g].plot(x_arr, y_arr, 'D')  # Stem ends
-                axes[2,g].plot([0, 0], [y_arr.min(), y_arr.max()], '--')  # Middle bar
-                axes[2,g].set_yticks(range(len(dl1.variable.values)))
-                ytick=dl1.variable.values
-                for ind in range(len(ytick)):
-                    if len(ytick[ind])>10:
-                        ytick[ind]=ytick[ind][0:7]+'...'
-                axes[2,g].set_yticklabels(ytick)
-                axes[2,g].set_title('ABS Loadings: {}'.format(group_label), fontsize=30)
-                axes[2,g].tick_params(labelsize=25)
-            ## Increase size to avoid chart to disappear
-                ymin, ymax = axes[1,g].get_ylim()
-                axes[2,g].set_ylim([ymin-0.5,ymax+0.5])
-        elif len(group_list)==1:
-                group=group_list[0]
-                group_label = group
+        ## Upper plot
+            ddatac.loc[:,group].plot(ax=axes[0,g])
+            axes[0,g].axhline(y=0, c='black', linewidth=0.7)
+            axes[0,g].set_title('{} over time'.format(group_label),
+                            fontsize=30, y=1.05)
+            axes[0,g].set_xlabel('')
+            # Rotate the date ticks in the same call that sets their size
+            # (the pandas date locator is kept, it labels only its own ticks)
+            axes[0,g].tick_params(axis='x', labelrotation=70, labelsize=18)
+            axes[0,g].tick_params(axis='y', labelsize=18)
+              
+        ## Middle plot
+            dl1 = dl1_by_group[group]
+            x_arr = dl1.norm_loadings.values
+            y_arr = np.arange(len(dl1.variable))
+            axes[1,g].hlines(y_arr, 0, x_arr, color='red')  # Stems
+            axes[1,g].plot(x_arr, y_arr, 'D')  # Stem ends
+            axes[1,g].plot([0, 0], [y_arr.min(), y_arr.max()], '--')  # Middle bar
+            axes[1,g].set_yticks(range(len(dl1.variable.values)))
+            ytick=truncate_labels(dl1.variable)
+            axes[1,g].set_yticklabels(ytick)
+            axes[1,g].set_title('Loadings: {}'.format(group_label), fontsize=30)
+            axes[1,g].tick_params(labelsize=25)
+        ## Increase size to avoid chart to disappear
+            ymin, ymax = axes[1,g].get_ylim()
+            axes[1,g].set_ylim([ymin-0.5,ymax+0.5])
             
-            ## Upper plot
-                ddatac.loc[:,group].plot(ax=axes[0])
-                axes[0].axhline(y=0, c='black', linewidth=0.7)
-                axes[0].set_title('{} over time'.format(group_label),
-                                fontsize=30, y=1.05)
-                axes[0].set_xlabel('')
-                axes[0].tick_params(labelsize=18)
-                plt.setp(axes[0].xaxis.get_majorticklabels(), rotation=70 )
-                  
-            ## Middle plot
-                dl1 = dload[dload.group==group]
-                dl1['loadings'] = dl1['loadings'] # Now remove absolute
-                dl1 = dl1.sort_values(by=['loadings'], ascending=[0])
-                sum_abs = np.sum(np.absolute(dl1.loadings))
-                dl1['norm_loadings'] = dl1['loadings']/sum_abs
-                x_arr = dl1.norm_loadings.values
-                y_arr = np.arange(len(dl1.variable))
-                axes[1].hlines(y_arr, 0, x_arr, color='red')  # Stems
-                axes[1].plot(x_arr, y_arr, 'D')  # Stem ends
-                axes[1].plot([0, 0], [y_arr.min(), y_arr.max()], '--')  # Middle bar
-                axes[1].set_yticks(range(len(dl1.variable.values)))
-                ytick=dl1.variable.values
-                for ind in range(len(ytick)):
-                    if len(ytick[ind])>10:
-                        ytick[ind]=ytick[ind][0:7]+'...'
-                axes[1].set_yticklabels(ytick)
-                axes[1].set_title('Loadings: {}'.format(group_label), fontsize=30)
-                axes[1].tick_params(labelsize=25)
-            ## Increase size to avoid chart to disappear
-                ymin, ymax = axes[1].get_ylim()
-                axes[1].set_ylim([ymin-0.5,ymax+0.5])
-                
-                x_arr = [abs(e) for e in dl1.norm_loadings.values]
-                y_arr = np.arange(len(dl1.variable))
-                axes[2].hlines(y_arr, 0, x_arr, color='red')  # Stems
-                axes[2].plot(x_arr, y_arr, 'D')  # Stem ends
-                axes[2].plot([0, 0], [y_arr.min(), y_arr.max()], '--')  # Middle bar
-                axes[2].set_yticks(range(len(dl1.variable.values)))
-                ytick=dl1.variable.values
-                for ind in range(len(ytick)):
-                    if len(ytick[ind])>10:
-                        ytick[ind]=ytick[ind][0:7]+'...'
-                axes[2].set_yticklabels(ytick)
-                axes[2].set_title('ABS Loadings: {}'.format(group_label), fontsize=30)
-                axes[2].tick_params(labelsize=25)
-            ## Increase size to avoid chart to disappear
-                ymin, ymax = axes[1].get_ylim()
-                axes[2].set_ylim([ymin-0.5,ymax+0.5])
             
+        ## Buttom plot
+            x_arr = np.abs(dl1.norm_loadings.values)
+            y_arr = np.arange(len(dl1.variable))
+            axes[2,g].hlines(y_arr, 0, x_arr, color='red')  # Stems
+            axes[2,g].plot(x_arr, y_arr, 'D')  # Stem ends
+            axes[2,g].plot([0, 0], [y_arr.min(), y_arr.max()], '--')  # Middle bar
+            axes[2,g].set_yticks(range(len(dl1.variable.values)))
+            axes[2,g].set_yticklabels(ytick)
+            axes[2,g].set_title('ABS Loadings: {}'.format(group_label), fontsize=30)
+            axes[2,g].tick_params(labelsize=25)
+        ## Increase size to avoid chart to disappear
+            ymin, ymax = axes[1,g].get_ylim()
+            axes[2,g].set_ylim([ymin-0.5,ymax+0.5])
             
     
             
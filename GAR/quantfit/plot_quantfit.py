@@ -12,24 +12,24 @@ Editted by cwang2@imf.org
 #import os, sys, importlib                             ## Operating system
 import pandas as pd                                   ## Dataframes
 import numpy as np                                    ## Numeric tools
-import matplotlib.pyplot as plt                       ## Plotting
-import seaborn as sns                                 ## Plotting
 from matplotlib.gridspec import GridSpec
 from matplotlib.ticker import FormatStrFormatter
 ###############################################################################
 #%% Plotting
 ###############################################################################
-## Style of the charts
-plt.style.use('seaborn-white')
-
-## Charting parameters : size
-from pylab import rcParams
-plt.close('all')  
+## pyplot and the style of the charts are loaded on the first call of
+## coeff_plot, as in partition/plot_partition.py
+_STYLE_SET = False
 
 ###############################################################################
 #%% Coefficients plotting
 ###############################################################################
 def coeff_plot(dcoeffc, regressors, qlist):
+    global _STYLE_SET
+    import matplotlib.pyplot as plt                   ## Plotting
+    if not _STYLE_SET:
+        plt.style.use('seaborn-white')
+        _STYLE_SET = True
     plt.close('all')    
     qlist.sort()
     
@@ -43,6 +43,9 @@ def coeff_plot(dcoeffc, regressors, qlist):
 #    dcoeffc = dcoeff[(dcoeff[group] == group_value)]
 #    dcoeffc = dcoeffc.rename(columns={'coeff':'standardized coefficient'}) 
     dcoeffc['errors'] = (dcoeffc['upper'] - dcoeffc['lower'])/2
+    ## Split the coefficients by variable once, instead of filtering the
+    ## full frame for every plotted variable
+    dcoeff_by_var = {var: dcv for var, dcv in dcoeffc.groupby('variable', sort=False)}
 
     ## Variables text
     variable_list_coeff = regressors
@@ -71,7 +74,7 @@ def coeff_plot(dcoeffc, regressors, qlist):
         else:
             variable_label = varn
             
-        dcv = dcoeffc.loc[(dcoeffc.variable == variable),:].copy()
+        dcv = dcoeff_by_var.get(variable, dcoeffc.iloc[0:0]).copy()
         dcv = dcv.reset_index()
         dcv = dcv.set_index(dcv['quantile'])
         dcv = dcv.reindex(qlist)
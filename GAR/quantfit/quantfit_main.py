@@ -1,19 +1,45 @@
 
 import os
+import sys
+import hashlib
+import importlib.util
 from datetime import datetime as date
 import time
 import warnings # suppress warnings
 warnings.filterwarnings("ignore")
+from concurrent.futures import ThreadPoolExecutor
 
 ## 3rd-party modules
 import pandas as pd
 import numpy as np
 import math
+# The parquet file cache of read_data_quantfit needs pyarrow or fastparquet
+HAS_PARQUET = any(importlib.util.find_spec(engine) is not None
+                  for engine in ('pyarrow', 'fastparquet'))
+import matplotlib
+# Figures are only saved to file/Excel, never displayed, so the
+# non-interactive backend is enough and allows plotting off the main thread
+matplotlib.use('Agg')
 
 from GAR import wb
 from GAR.globals import read_parameters_global, read_partition_groups, show_message, add_logsheet
 from .plot_quantfit import coeff_plot
-from .condqgreg import condquant
+from .transforms import transform_regressors
+
+# Keys of the dicts for input/output parameters holding sheetnames
+SHEET_KEYS = ('sheet_input', 'sheet_quantreg', 'sheet_cond_quant')
+
+# In-memory cache of the data read in by read_data_quantfit: for each
+# (workbook, sheetname) the latest fingerprint_data_quantfit and data.
+# Like the other module-level state here, it only survives between two
+# button clicks if Excel runs the code with the xlwings UDF server
+# (USE UDF SERVER = True, see README.md), otherwise every RunPython call
+# starts a new Python interpreter.
+_DATA_CACHE = dict()
+
+# Single worker thread used to draw and save the coefficient figure while
+# the Excel output is being written
+_executor = ThreadPoolExecutor(max_workers=1)
 
 ###############################################################################
 #%% Functions for step 2: quantfit
@@ -71,7 +97,7 @@ def do_quantfit(debug=False):
     # Total time for this operation (formatted string)
     tdiff = "{:.1f}".format(t1 - t0)
     
-    sheets = [dict_output_quantfit[key] for key in dict_output_quantfit if key.find('sheet') != -1]
+    sheets = [dict_output_quantfit[key] for key in SHEET_KEYS]
     message = 'Finished with quantfit in ' + tdiff + ' sec,\n'
     message += 'output is in sheets ' + ', '.join(sheets) 
     show_message(message,msgtype='info')
@@ -94,7 +120,7 @@ def prerun_quantfit(debug=False):
         print('=' * 30)
 
     # Keys for input parameter dict
-    keys = ['quantlist', 'regressors', 'sheet_input', 'sheet_quantreg', 'sheet_cond_quant']
+    keys = ['quantlist', 'regressors'] + list(SHEET_KEYS)
     # Check that the necessary steps beforehand have been done.
     
     # --------------------------
@@ -141,40 +167,38 @@ def read_parameters_quantfit():
     # ---------------------------#
     # Read in necessary values
     # ---------------------------#
+    # Each range(...).value is a round trip to Excel, so the cells are read
+    # in as few blocks as possible and parsed in Python afterwards.
+    sheet = wb.sheets['Input_parameters']
 
     # Read in quantlist
     cellpos = 'F31'
     # Get a list of all values starting at cellpos going down
-    dict_parameters_quantfit['quantlist'] = wb.sheets['Input_parameters'].range(cellpos).expand('down').value
+    dict_parameters_quantfit['quantlist'] = sheet.range(cellpos).expand('down').options(ndim=1).value
 
     # Read in info on regressors.
     dict_parameters_quantfit['regressors'] = dict()
     # Start with the first cell that contains the regressors.
     startrow = 31
     cellpos = 'A' + str(startrow)
-    # Read down and get a list of all regressors
-    regressors = wb.sheets['Input_parameters'].range(cellpos).expand('down').value
-    if not isinstance(regressors, (list, tuple)):
-        regressors = [regressors]
-    for iregressor, regressor in enumerate(regressors):
-       
-
-        # Get the cells for transformation and optional parameter
-        # from columns B and C for this row
-        colnum = startrow+iregressor
-        transform = wb.sheets['Input_parameters'].range('B' + str(colnum)).value
-        option    = wb.sheets['Input_parameters'].range('D' + str(colnum)).value
-        dict_parameters_quantfit['regressors'][regressor+'_trans_'+str(iregressor)+'_'+transform] = dict()
+    # Read down column A to get the extent of the regressors and read
+    # columns A:D (regressor, transformation, -, optional parameter) at once
+    block = sheet.range(cellpos).expand('down').resize(column_size=4).options(ndim=2).value
+    for iregressor, row in enumerate(block):
+        regressor, transform, option = row[0], row[1], row[3]
+        reg_long = regressor+'_trans_'+str(iregressor)+'_'+transform
         # Set as values of dict
-        dict_parameters_quantfit['regressors'][regressor+'_trans_'+str(iregressor)+'_'+transform]['transform'] = transform
-        dict_parameters_quantfit['regressors'][regressor+'_trans_'+str(iregressor)+'_'+transform]['option'] = option
+        dict_parameters_quantfit['regressors'][reg_long] = dict()
+        dict_parameters_quantfit['regressors'][reg_long]['transform'] = transform
+        dict_parameters_quantfit['regressors'][reg_long]['option'] = option
 
     # Read in output sheets
     startrow = 51
-    for isheetname, sheetname in enumerate(['sheet_quantreg', 'sheet_cond_quant']):
-        colnum = startrow + isheetname
-        cellpos = 'B' + str(colnum)
-        dict_parameters_quantfit[sheetname] = wb.sheets['Input_parameters'].range(cellpos).value
+    sheetvars = ['sheet_quantreg', 'sheet_cond_quant']
+    cellrange = 'B' + str(startrow) + ':B' + str(startrow + len(sheetvars) - 1)
+    sheetnames = sheet.range(cellrange).options(ndim=1).value
+    for sheetvar, sheetname in zip(sheetvars, sheetnames):
+        dict_parameters_quantfit[sheetvar] = sheetname
         # checking of values will be done in check_parameters_quantfit
 
     # The sheetname for the input is read in from what is in cell B24.
@@ -182,7 +206,7 @@ def read_parameters_quantfit():
     # the output, we have to assume that the user has not changed this cell
     # since running the partitions.
     cellpos = 'B24'
-    dict_parameters_quantfit['sheet_input'] = wb.sheets['Input_parameters'].range(cellpos).value
+    dict_parameters_quantfit['sheet_input'] = sheet.range(cellpos).value
 
     return dict_parameters_quantfit
 
@@ -210,12 +234,14 @@ def check_parameters_quantfit(dict_input_quantfit, keys):
                 message+= 'Given values: ' + str(val)
                 show_message(message, halt=True)
             # Check that necessary values are present
-            necessary_vals = [0.10, 0.25, 0.50, 0.75, 0.90]
-            for _val in necessary_vals:
-                if _val not in val:
-                    message = 'Value of ' + str(_val) + ' must be included in quantlist'
-                    message += 'Given values: ' + str(val)
-                    show_message(message, halt=True)
+            necessary_vals = {0.10, 0.25, 0.50, 0.75, 0.90}
+            missing = necessary_vals - set(val)
+            if missing:
+                message = 'Values of ' + str(sorted(missing)) + ' must be included in quantlist'
+                message += 'Given values: ' + str(val)
+                show_message(message, halt=True)
+            # Store as a sorted array of unique values for the quantile regressions
+            dict_input_quantfit[key] = np.unique(np.asarray(val, dtype=np.float64))
 
         if key == 'regressors':
             # val is a dict of dicts with keys [regressor]['transform/option']
@@ -256,7 +282,7 @@ def check_parameters_quantfit(dict_input_quantfit, keys):
                     message = 'Input sheet for quantfit: ' + sheetname + ' does not exist'
                     show_message(message, halt=True)
 
-        elif key.find('sheet_') != -1:
+        elif key in SHEET_KEYS:
             # If a value was specified, check that it is not one of the
             # input sheet names and use it as the output sheet name.
             # Otherwise we will use the default 'Output_quantfits'
@@ -280,10 +306,96 @@ def read_data_quantfit(sheetname):
     '''
     Read in the input data for quantfit.
     Checks for the sheetname should have been done in check_parameters_quantfit.
+
+    Reading the partition output sheet is the most expensive Excel access of
+    quantfit, so the result is cached in memory and, if a parquet engine is
+    installed, in a parquet file in the .gar_cache folder next to the
+    workbook. Only the latest data of each workbook and sheet is kept, along
+    with its fingerprint from fingerprint_data_quantfit (the timestamp of the
+    last partition run), so it is reused until the partitions are run again.
+
+    Limitation: changes made by hand to the partition output sheet, without
+    running the partitions again, are not detected and the cached data would
+    be used. Run the partitions again after such edits.
+
+    If no cache can be reused (no parquet engine and a new interpreter for
+    every RunPython call, i.e. no UDF server) the sheet is read directly,
+    without paying for the fingerprint.
+    '''
+    use_cache = HAS_PARQUET or bool(_DATA_CACHE) or 'xlwings.server' in sys.modules
+    if not use_cache:
+        return read_sheet_quantfit(sheetname)
+
+    fullname = wb.fullname
+    key  = fingerprint_data_quantfit(sheetname, fullname)
+    if key is None:
+        # No partition timestamp to key on, do not use the cache
+        return read_sheet_quantfit(sheetname)
+    slot = (fullname, sheetname)
+    if slot in _DATA_CACHE and _DATA_CACHE[slot][0] == key:
+        return _DATA_CACHE[slot][1].copy()
+
+    # Cache files are named <workbook and sheet hash>_<fingerprint hash>
+    cachedir    = os.path.abspath(os.path.dirname(fullname) + '/.gar_cache')
+    slot_prefix = hashlib.md5(repr(slot).encode()).hexdigest() + '_'
+    cachefile   = os.path.join(cachedir, slot_prefix + hashlib.md5(repr(key).encode()).hexdigest() + '.parquet')
+    dall = None
+    if HAS_PARQUET and os.path.isfile(cachefile):
+        try:
+            dall = pd.read_parquet(cachefile)
+        except:
+            dall = None
+
+    if dall is None:
+        dall = read_sheet_quantfit(sheetname)
+        if HAS_PARQUET:
+            try:
+                if not os.path.isdir(cachedir):
+                    os.makedirs(cachedir)
+                # Remove the outdated files of this workbook and sheet
+                for filename in os.listdir(cachedir):
+                    if filename.startswith(slot_prefix):
+                        os.remove(os.path.join(cachedir, filename))
+                dall.to_parquet(cachefile)
+            except:
+                # The folder is not writable, only keep the in-memory cache
+                pass
+
+    # Replaces the previous data of this workbook and sheet
+    _DATA_CACHE[slot] = (key, dall)
+    return dall.copy()
+
+def read_sheet_quantfit(sheetname):
+    '''
+    Read the table starting at A1 of sheetname into a DataFrame.
+    The raw values are read in one call and the DataFrame is built in
+    pandas, which is faster than the xlwings DataFrame converter.
     '''
-    dall = wb.sheets[sheetname].range('A1').options(pd.DataFrame,index=False,expand='table').value
+    rows = wb.sheets[sheetname].range('A1').expand('table').options(ndim=2).value
+    dall = pd.DataFrame(rows[1:], columns=rows[0])
+    dall = dall.apply(pd.to_numeric, errors='ignore')
+    if 'date' in dall.columns:
+        dall['date'] = pd.to_datetime(dall['date'])
     return dall
 
+def fingerprint_data_quantfit(sheetname, fullname):
+    '''
+    Return a fingerprint of the input sheet for quantfit, or None if it
+    cannot be made.
+
+    Every time the partitions are output, postrun_partition writes its log
+    to the first columns of the Processing_log sheet, starting with a
+    timestamp in cell A2. The fingerprint is made of the workbook name, the
+    sheetname and that timestamp, so it changes with every partition run.
+    '''
+    try:
+        stamp = wb.sheets['Processing_log'].range('A2').value
+    except:
+        stamp = None
+    if stamp is None:
+        return None
+    return (fullname, sheetname, repr(stamp))
+
 def run_quantfit(dict_input_quantfit, df_quantfit, debug=False):
     '''
     Main run function for step 2, quantfit.
@@ -304,9 +416,9 @@ def run_quantfit(dict_input_quantfit, df_quantfit, debug=False):
         print('=' * 30)
 
     # ------------------------
-    # Create DataFrame for log
+    # Create list of log records
     # ------------------------
-    log_frame = pd.DataFrame(columns=['Time','Action'])
+    log_records = []
 
     # ------------------------
     # Create output dict
@@ -317,9 +429,8 @@ def run_quantfit(dict_input_quantfit, df_quantfit, debug=False):
     # Copy the output sheet names
     # from dict_input_quantfit
     # ------------------------
-    for key in dict_input_quantfit:
-        if key.find('sheet_') != -1:
-            dict_output_quantfit[key] = dict_input_quantfit[key]
+    for key in SHEET_KEYS:
+        dict_output_quantfit[key] = dict_input_quantfit[key]
     
     # ------------------------
     # Get parameters from
@@ -336,45 +447,63 @@ def run_quantfit(dict_input_quantfit, df_quantfit, debug=False):
     regressors=list(dict_input_quantfit['regressors'].keys())
     dict_output_quantfit['regressors']=dict_input_quantfit['regressors']
     
-    df_quantfit = df_quantfit.set_index(df_quantfit['date'], drop=False) 
-    for reg_long in  regressors:
-        reg_short=reg_long.split('_trans_')[0]
-        if dict_input_quantfit['regressors'][reg_long]['transform']=='None':
-            df_quantfit[reg_long]=df_quantfit[reg_short]
-        elif dict_input_quantfit['regressors'][reg_long]['transform']=='Lagged':
-            df_quantfit[reg_long]=df_quantfit[reg_short].shift(dict_input_quantfit['regressors'][reg_long]['option'])
-        elif dict_input_quantfit['regressors'][reg_long]['transform']=='MVA':
-            df_quantfit[reg_long]=df_quantfit[reg_short].rolling(window=dict_input_quantfit['regressors'][reg_long]['option']).mean()
-        elif dict_input_quantfit['regressors'][reg_long]['transform']=='Power': 
-            df_quantfit[reg_long]=df_quantfit[reg_short]**(dict_input_quantfit['regressors'][reg_long]['option'])
-        elif dict_input_quantfit['regressors'][reg_long]['transform']=='Diff': 
-            df_quantfit[reg_long]=df_quantfit[reg_short].diff(dict_input_quantfit['regressors'][reg_long]['option'])
-        elif dict_input_quantfit['regressors'][reg_long]['transform']=='ChangeRate': 
-            df_quantfit[reg_long]=df_quantfit[reg_short].pct_change(dict_input_quantfit['regressors'][reg_long]['option'])
-
-    print(df_quantfit.iloc[-1])        
+    # The transforms are positional, so make sure the rows are in date order
+    if not df_quantfit['date'].is_monotonic_increasing:
+        df_quantfit = df_quantfit.sort_values('date', kind='mergesort')
+    # Group the regressors by (transform, option) so that each transform is
+    # applied once on a 2D block of columns instead of once per regressor
+    by_transform = dict()
+    for j, reg_long in enumerate(regressors):
+        transform = dict_input_quantfit['regressors'][reg_long]['transform']
+        option    = dict_input_quantfit['regressors'][reg_long]['option']
+        by_transform.setdefault((transform, option), []).append(j)
+
+    # Fill a single column-major buffer with all the transformed regressors
+    # and add it to df_quantfit in one go to avoid fragmenting the frame
+    X = np.empty((len(df_quantfit), len(regressors)), dtype=np.float64, order='F')
+    for (transform, option), cols in by_transform.items():
+        reg_shorts = [regressors[j].split('_trans_')[0] for j in cols]
+        values = df_quantfit[reg_shorts].to_numpy(dtype=np.float64)
+        X[:, cols] = transform_regressors(values, transform, option)
+    df_regressors = pd.DataFrame(X, index=df_quantfit.index, columns=regressors)
+    df_quantfit = pd.concat([df_quantfit, df_regressors], axis=1, copy=False)
+
+    # The dates are kept as index, as the conditional quantiles are output
+    # with it. The concat above already returned a new frame, so the index is
+    # assigned to it directly: the caller's frame is left unchanged and, unlike
+    # set_index/set_axis, this does not copy the data
+    df_quantfit.index = df_quantfit['date']
+
+    if debug:
+        print(df_quantfit.iloc[-1])
     #df_quantfit = df_quantfit[:-horizon]
     # ------------------------
     # Run the quantfit
     # ------------------------
+    # numba is heavy to import, so it is only loaded with the first quantfit
+    # of the session (statsmodels is already imported by the segment step
+    # when GAR is imported). The numba kernels are compiled on their first
+    # call (or loaded from their on-disk cache) and then reused.
+    from .condqgreg import condquant
     qcoeff_all, dcond_quantiles_all, loco_all, exitcode = condquant(df_quantfit, depvar, regressors, horizon,dict_input_quantfit['quantlist'])
-    print(qcoeff_all[qcoeff_all['quantile']==0.1])
+    if debug:
+        print(qcoeff_all[qcoeff_all['quantile']==0.1])
     if exitcode<1:
         action = 'Failed to do quantile regression, exit code: ' + str(exitcode)
     else:
         action = 'Quantile regression finished succesfully.'
     tn = date.now().strftime('%Y-%m-%d %H:%M:%S')
-    log = pd.Series({'Time': tn, 'Action': action})
-    log_frame.append(log, ignore_index=True)
+    log_records.append({'Time': tn, 'Action': action})
 
     # Add return values
-    figs={}
-    
-    figs=coeff_plot(qcoeff_all,regressors,dict_input_quantfit['quantlist'])
+    # The figure is drawn in the background, figs is a Future of the figure.
+    # coeff_plot modifies its arguments so it is given copies of them.
+    figs=_executor.submit(coeff_plot, qcoeff_all.copy(), regressors, list(dict_input_quantfit['quantlist']))
     dict_output_quantfit['qcoef']      = qcoeff_all
     dict_output_quantfit['cond_quant'] = dcond_quantiles_all
     dict_output_quantfit['localprj']    = loco_all
     dict_output_quantfit['figs'] = figs
+    dict_output_quantfit['log']  = log_records
     
     return dict_output_quantfit
     
@@ -394,11 +523,40 @@ def postrun_quantfit(dict_output_quantfit, debug=False):
         print('start of postrun_quantfit')
         print('=' * 30)
 
-    # Create DataFrame for log
-    log_frame = pd.DataFrame(columns=['Time','Action'])
+    # Suppress screen updating, recalculation and alerts while writing
+    # the output, and restore the previous Excel state afterwards
+    app = wb.app
+    app_state = (app.screen_updating, app.calculation, app.display_alerts)
+    app.screen_updating = False
+    app.calculation = 'manual'
+    app.display_alerts = False
+    try:
+        write_output_quantfit(dict_output_quantfit, debug=debug)
+    finally:
+        app.screen_updating, app.calculation, app.display_alerts = app_state
+
+def write_output_quantfit(dict_output_quantfit, debug=False):
+    '''
+    Write the quantfit output sheets, the figure and the log to Excel.
+    Called from postrun_quantfit once the Excel state has been set up.
+    '''
+
+    # Start the list of log records from the ones of the main run
+    log_records = list(dict_output_quantfit.get('log', []))
+
+    # Set the path of the output file to be in the same dir as the
+    # calling Excel file, and save the figure in the background (once it
+    # has been drawn) while the output sheets are written
+    fullpath = os.path.abspath(os.path.dirname(wb.fullname) + '/figures')
+    if not os.path.isdir(fullpath):
+        os.makedirs(fullpath)
+    outfilename = fullpath+'\\quantfit_'+date.now().strftime('%Y_%m-%d@%H_%M-%S')+'.png'
+    fig_saved = _executor.submit(save_figure, dict_output_quantfit['figs'], outfilename)
     
     # Create the output sheets
-    sheetvars = [key for key in dict_output_quantfit if key.find('sheet') != -1]
+    sheetvars = SHEET_KEYS
+    # Get existing sheetnames (once, each sheet.name is a call to Excel)
+    sheetnames = {sheet.name for sheet in wb.sheets}
     for sheetvar in sheetvars:
 
         # Don't do anything for the input sheet
@@ -413,9 +571,6 @@ def postrun_quantfit(dict_output_quantfit, debug=False):
         # Get the actual sheet name
         sheetname = dict_output_quantfit[sheetvar]
 
-        # Get existing sheetnames
-        sheetnames = [sheet.name for sheet in wb.sheets]
-
         try:
             # Clear the sheet if it already exists
             if sheetname in sheetnames:
@@ -424,6 +579,7 @@ def postrun_quantfit(dict_output_quantfit, debug=False):
             # Otherwise add it after the "Data" sheet
             else:
                 wb.sheets.add(sheetname, after='Data')
+                sheetnames.add(sheetname)
                 # Set output sheet colors to blue
                 wb.sheets[sheetname].api.Tab.ColorIndex = 23
                 action = 'Created sheet ' + sheetname
@@ -432,44 +588,39 @@ def postrun_quantfit(dict_output_quantfit, debug=False):
 
         # Add to log
         tn=date.now().strftime('%Y-%m-%d %H:%M:%S')
-        log = pd.Series({'Time': tn, 'Action': action})
-        log_frame = log_frame.append(log, ignore_index=True)
+        log_records.append({'Time': tn, 'Action': action})
         
     # end of loop over output sheetvars
 
-    # Write out quantfit results
+    # Write out quantfit results, each as a single raw 2D block
+    written = []
     try:
         for sheetvar in sheetvars:
             sheetname = dict_output_quantfit[sheetvar]
             if sheetvar == 'sheet_quantreg':
-                wb.sheets[sheetname].range('A1').options(index=False).value = dict_output_quantfit['qcoef']
-                wb.sheets[sheetname].autofit()
+                wb.sheets[sheetname].range('A1').value = frame_to_values(dict_output_quantfit['qcoef'], index=False)
+                written.append(sheetname)
             elif sheetvar == 'sheet_cond_quant':
-                wb.sheets[sheetname].range('A1').options(index=True).value = dict_output_quantfit['cond_quant']
-                wb.sheets[sheetname].autofit()
+                wb.sheets[sheetname].range('A1').value = frame_to_values(dict_output_quantfit['cond_quant'], index=True)
+                written.append(sheetname)
+        for sheetname in written:
+            wb.sheets[sheetname].autofit()
         action='Quantfit results saved succesfully.'
     except:
         action='Unable to output quantfit results.'
         print(action)
         
     sheetname = dict_output_quantfit['sheet_quantreg']    
-    try:
-        wb.sheets[sheetname].pictures[0].delete()
-    except:
-        pass
     sheet = wb.sheets[sheetname]
-    fig = dict_output_quantfit['figs']
-
-    # Set the path of the output file to be in the same dir as the
-    # calling Excel file
-    fullpath = os.path.abspath(os.path.dirname(wb.fullname) + '/figures')
-    if not os.path.isdir(fullpath):
-        os.makedirs(fullpath)
-    outfilename = fullpath+'\\quantfit_'+date.now().strftime('%Y_%m-%d@%H_%M-%S')+'.png'
-    fig.savefig(outfilename)
+    # Remove the figures from a previous run
+    for pic in list(sheet.pictures):
+        pic.delete()
+    # Wait for the figure to be saved and add the png file to the sheet,
+    # passing the figure itself would make xlwings render it a second time
+    fig_saved.result()
     cr=len(dict_output_quantfit['regressors'].keys())
     try:
-        pic=sheet.pictures.add(fig, name='MyPlot_q', update=True, left=sheet.range('N6').left, top=sheet.range('N6').top, height=340*(cr//4+1), width=240*(min(4,cr+1)))
+        pic=sheet.pictures.add(outfilename, name='MyPlot_q', update=True, left=sheet.range('N6').left, top=sheet.range('N6').top, height=340*(cr//4+1), width=240*(min(4,cr+1)))
         pic.height=340*(cr//4+1)
         pic.width=240*(min(4,cr+1))
         
@@ -479,8 +630,30 @@ def postrun_quantfit(dict_output_quantfit, debug=False):
         
     # Add to log
     tn=date.now().strftime('%Y-%m-%d %H:%M:%S')
-    log = pd.Series({'Time': tn, 'Action': action})
-    log_frame = log_frame.append(log, ignore_index=True)
+    log_records.append({'Time': tn, 'Action': action})
 
     # Write out log_frame
+    log_frame = pd.DataFrame(log_records, columns=['Time','Action'])
     add_logsheet(wb, log_frame, colnum=3)
+
+def save_figure(fig_future, outfilename):
+    '''
+    Wait for the figure of fig_future to be drawn and save it to outfilename,
+    with the same settings xlwings uses when adding a figure to a sheet.
+    '''
+    fig = fig_future.result()
+    fig.savefig(outfilename, dpi=200, bbox_inches='tight')
+
+def frame_to_values(df, index=False):
+    '''
+    Convert df to a list of rows with the header as the first row, so that
+    it can be written to Excel with a single range(...).value assignment
+    instead of going through the xlwings DataFrame converter.
+    NaN values are replaced by None so that they show up as empty cells.
+    '''
+    header = list(df.columns)
+    if index:
+        header = [df.index.name] + header
+        df = df.reset_index()
+    values = df.astype(object).where(pd.notnull(df), None).values.tolist()
+    return [header] + values
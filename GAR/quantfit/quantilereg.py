@@ -16,6 +16,100 @@ import statsmodels.formula.api as smf                   ## Formulas
 import time
 
 from sklearn.preprocessing import scale 
+from scipy import stats                                 ## Statistics
+from statsmodels.regression.linear_model import RegressionResultsWrapper
+from statsmodels.regression.quantile_regression import (QuantRegResults,
+                                                        hall_sheather,
+                                                        kernels)
+
+## Numba is optional: without it the fits are done by statsmodels QuantReg
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+## IRLS settings, same as the ones used by statsmodels QuantReg.fit below
+MAX_ITER = 1000
+P_TOL = 1e-05
+
+###############################################################################
+#%% Compiled IRLS kernel for the quantile regressions
+###############################################################################
+if HAS_NUMBA:
+    @njit(cache=True)
+    def irls_quantreg(X, y, q, max_iter, p_tol):
+        """ 
+        Quantile regression of y on X at quantile q, by iteratively
+        reweighted least squares. This is the loop of statsmodels
+        QuantReg.fit, returns the coefficients and the number of iterations
+        """
+        n, k = X.shape
+        beta = np.ones(k)
+        xstar = X.copy()
+        history = np.zeros((10, k)) # Last 10 iterations, to detect cycles
+        diff = 10.0
+        n_iter = 0
+        cycle = False
+        while n_iter < max_iter and diff > p_tol and not cycle:
+            n_iter += 1
+            beta0 = beta
+            xtx = np.dot(xstar.T, X)
+            xty = np.dot(xstar.T, y)
+            beta = np.dot(np.linalg.pinv(xtx), xty)
+            resid = y - np.dot(X, beta)
+            for i in range(n):
+                r = resid[i]
+                if abs(r) < .000001:
+                    r = .000001 if r >= 0 else -.000001
+                r = abs(q*r) if r < 0 else abs((1 - q)*r)
+                for j in range(k):
+                    xstar[i, j] = X[i, j]/r
+            diff = np.max(np.abs(beta - beta0))
+            history[n_iter % 10, :] = beta
+            if n_iter >= 300 and n_iter % 100 == 0:
+                for ii in range(2, 10):
+                    if np.all(beta == history[(n_iter - ii + 1) % 10, :]):
+                        cycle = True
+                        break
+        return beta, n_iter
+
+    @njit(parallel=True, cache=True)
+    def irls_quantreg_all(X, y, qarr, max_iter, p_tol):
+        """ Run irls_quantreg for every quantile of qarr in parallel """
+        nq = qarr.shape[0]
+        betas = np.empty((nq, X.shape[1]))
+        n_iters = np.empty(nq, dtype=np.int64)
+        for iq in prange(nq):
+            beta, n_iter = irls_quantreg(X, y, qarr[iq], max_iter, p_tol)
+            betas[iq, :] = beta
+            n_iters[iq] = n_iter
+        return betas, n_iters
+
+def quantreg_results(model, q, beta, n_iter):
+    """ 
+    Package the coefficients beta of the quantile regression model at q into
+    a statsmodels results object, with the same robust covariance
+    (Hall-Sheather bandwidth, Epanechnikov kernel) as QuantReg.fit
+    """
+    endog, exog = model.endog, model.exog
+    nobs = exog.shape[0]
+    e = endog - np.dot(exog, beta)
+    iqre = stats.scoreatpercentile(e, 75) - stats.scoreatpercentile(e, 25)
+    h = hall_sheather(nobs, q)
+    h = min(np.std(endog), iqre/1.34)*(stats.norm.ppf(q + h) - stats.norm.ppf(q - h))
+    fhat0 = 1./(nobs*h)*np.sum(kernels['epa'](e/h))
+    d = np.where(e > 0, (q/fhat0)**2, ((1 - q)/fhat0)**2)
+    xtxi = np.linalg.pinv(np.dot(exog.T, exog))
+    xtdx = np.dot(exog.T*d[np.newaxis, :], exog)
+    vcov = np.dot(np.dot(xtxi, xtdx), xtxi)
+
+    lfit = QuantRegResults(model, beta, normalized_cov_params=vcov)
+    lfit.q = q
+    lfit.iterations = n_iter
+    lfit.sparsity = 1./fhat0
+    lfit.bandwidth = h
+    return(RegressionResultsWrapper(lfit))
 
 ###############################################################################
 #%% Run the quantiles regressions
@@ -96,14 +190,23 @@ class QuantileReg(object):
     def __qfit_dict(self): 
         """ Estimate the fit for every quantiles """
         qfit_dict = dict()
-        for tau in self.quantile_list:
-            reg_f = self.reg_formula
-            qfit = smf.quantreg(formula=reg_f, data=self.data).fit(q=tau,
-                                                                   maxiter=2000,
-                                                                   p_tol=1e-05)
-
-
-            qfit_dict[tau] = qfit
+        reg_f = self.reg_formula
+        if HAS_NUMBA:
+            ## Fit all the quantiles at once with the compiled kernel
+            model = smf.quantreg(formula=reg_f, data=self.data)
+            X = np.ascontiguousarray(model.exog, dtype=np.float64)
+            y = np.ascontiguousarray(model.endog, dtype=np.float64)
+            qarr = np.asarray(self.quantile_list, dtype=np.float64)
+            betas, n_iters = irls_quantreg_all(X, y, qarr, MAX_ITER, P_TOL)
+            for iq, tau in enumerate(self.quantile_list):
+                qfit_dict[tau] = quantreg_results(model, tau, betas[iq],
+                                                  int(n_iters[iq]))
+        else:
+            for tau in self.quantile_list:
+                qfit = smf.quantreg(formula=reg_f, data=self.data).fit(q=tau,
+                                                                       max_iter=MAX_ITER,
+                                                                       p_tol=P_TOL)
+                qfit_dict[tau] = qfit
         return(qfit_dict)
 
     def __mfit(self): 
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Transformations of the regressors for quantfit (step 2).
+These functions only use numpy/pandas, independently of Excel.
+"""
+
+import pandas as pd
+import numpy as np
+try:
+    import bottleneck as bn
+except ImportError:
+    # Moving averages fall back to pandas rolling means
+    bn = None
+
+def shift_rows(values, periods):
+    '''
+    Shift the rows of the 2D array values by periods (which can be negative),
+    filling with NaN, as DataFrame.shift does.
+    '''
+    out = np.full(values.shape, np.nan)
+    if periods == 0:
+        out[:] = values
+    elif periods > 0:
+        out[periods:] = values[:-periods]
+    else:
+        out[:periods] = values[-periods:]
+    return out
+
+def ffill_rows(values):
+    '''
+    Forward fill the NaN values along the rows of the 2D array values.
+    '''
+    nrows = values.shape[0]
+    idx = np.where(np.isnan(values), 0, np.arange(nrows)[:, np.newaxis])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return np.take_along_axis(values, idx, axis=0)
+
+def transform_regressors(values, transform, option):
+    '''
+    Apply transform with parameter option to each column of the 2D array
+    values. The results are the same as the pandas methods used previously
+    (shift, rolling mean, power, diff and pct_change).
+    '''
+    if transform == 'Lagged':
+        return shift_rows(values, option)
+    elif transform == 'MVA':
+        # bottleneck only accepts windows between 1 and the number of rows,
+        # pandas returns all NaN otherwise
+        if bn is not None and 1 <= option <= values.shape[0]:
+            return bn.move_mean(values, window=option, min_count=option, axis=0)
+        return pd.DataFrame(values).rolling(window=option).mean().to_numpy()
+    elif transform == 'Power':
+        return np.power(values, option)
+    elif transform == 'Diff':
+        return values - shift_rows(values, option)
+    elif transform == 'ChangeRate':
+        # pct_change forward fills missing values before the ratio
+        filled = ffill_rows(values)
+        return filled/shift_rows(filled, option) - 1
+    return values
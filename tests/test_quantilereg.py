@@ -0,0 +1,70 @@
+'''
+Check the compiled IRLS kernel of GAR/quantfit/quantilereg.py against
+the statsmodels quantile regression fit.
+'''
+
+import os
+import importlib.util
+
+import numpy as np
+import pandas as pd
+import pytest
+
+smf = pytest.importorskip('statsmodels.formula.api')
+pytest.importorskip('sklearn')
+
+
+def load_quantilereg():
+    '''
+    Load quantilereg.py directly from its file, since importing the GAR
+    package needs xlwings and an Excel caller.
+    '''
+    path = os.path.join(os.path.dirname(__file__), '..', 'GAR', 'quantfit', 'quantilereg.py')
+    spec = importlib.util.spec_from_file_location('quantilereg', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_data(nobs=200, seed=0):
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame({'x1': rng.normal(size=nobs), 'x2': rng.normal(size=nobs)})
+    df['y'] = 1 + 0.5*df['x1'] - 0.3*df['x2'] + rng.standard_t(5, size=nobs)
+    return df
+
+
+def test_kernel_matches_statsmodels():
+    qr = load_quantilereg()
+    if not qr.HAS_NUMBA:
+        pytest.skip('numba is not installed')
+
+    model = smf.quantreg('y ~ x1 + x2', data=synthetic_data())
+    qarr = np.array([0.10, 0.25, 0.50, 0.75, 0.90])
+    X = np.ascontiguousarray(model.exog, dtype=np.float64)
+    y = np.ascontiguousarray(model.endog, dtype=np.float64)
+    betas, n_iters = qr.irls_quantreg_all(X, y, qarr, qr.MAX_ITER, qr.P_TOL)
+
+    for iq, q in enumerate(qarr):
+        ref = model.fit(q=q, max_iter=qr.MAX_ITER, p_tol=qr.P_TOL)
+        res = qr.quantreg_results(model, q, betas[iq], int(n_iters[iq]))
+        np.testing.assert_allclose(res.params, ref.params, rtol=1e-8, atol=1e-10)
+        np.testing.assert_allclose(res.bse, ref.bse, rtol=1e-8, atol=1e-10)
+        assert res.iterations == ref.iterations
+        np.testing.assert_allclose(res.prsquared, ref.prsquared, rtol=1e-8)
+
+
+def test_quantilereg_without_kernel_matches(monkeypatch):
+    qr = load_quantilereg()
+    df = synthetic_data()
+    ql = [0.10, 0.50, 0.90]
+
+    fit = qr.QuantileReg('y', indvars=['x1', 'x2'], quantile_list=ql,
+                         data=df, scaling=False)
+    monkeypatch.setattr(qr, 'HAS_NUMBA', False)
+    ref = qr.QuantileReg('y', indvars=['x1', 'x2'], quantile_list=ql,
+                         data=df, scaling=False)
+
+    np.testing.assert_allclose(fit.coeff['coeff'].values, ref.coeff['coeff'].values,
+                               rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(fit.coeff['pval'].values, ref.coeff['pval'].values,
+                               rtol=1e-6, atol=1e-10)
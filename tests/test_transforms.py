@@ -0,0 +1,79 @@
+'''
+Check the regressor transformations of GAR/quantfit/transforms.py against
+the pandas methods they replace.
+'''
+
+import os
+import importlib.util
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def load_transforms():
+    '''
+    Load transforms.py directly from its file, since importing the GAR
+    package needs xlwings and an Excel caller.
+    '''
+    path = os.path.join(os.path.dirname(__file__), '..', 'GAR', 'quantfit', 'transforms.py')
+    spec = importlib.util.spec_from_file_location('transforms', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def data_with_gaps(nobs=40, seed=0):
+    ''' Three positive series with leading NaNs and NaN gaps '''
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame(rng.uniform(1, 2, size=(nobs, 3)), columns=['a', 'b', 'c'])
+    df.iloc[:3, 0] = np.nan
+    df.iloc[10:13, 1] = np.nan
+    df.iloc[[5, 20, 21, 35], 2] = np.nan
+    return df
+
+
+def pandas_transform(df, transform, option):
+    ''' The pandas methods previously used in run_quantfit '''
+    if transform == 'Lagged':
+        return df.shift(option)
+    elif transform == 'MVA':
+        return df.rolling(window=option).mean()
+    elif transform == 'Power':
+        return df**option
+    elif transform == 'Diff':
+        return df.diff(option)
+    elif transform == 'ChangeRate':
+        # pct_change(option) forward fills the NaN values first
+        return df.ffill().pct_change(option, fill_method=None)
+    return df
+
+
+@pytest.mark.parametrize('use_bottleneck', [True, False])
+@pytest.mark.parametrize('transform, option', [
+    ('None', None),
+    ('Lagged', 0), ('Lagged', 1), ('Lagged', 4), ('Lagged', -2), ('Lagged', 45),
+    ('MVA', 0), ('MVA', 1), ('MVA', 3), ('MVA', 40), ('MVA', 50),
+    ('Power', 2), ('Power', 3),
+    ('Diff', 0), ('Diff', 1), ('Diff', 4), ('Diff', 45),
+    ('ChangeRate', 0), ('ChangeRate', 1), ('ChangeRate', 4), ('ChangeRate', 45),
+])
+def test_transform_matches_pandas(monkeypatch, use_bottleneck, transform, option):
+    tr = load_transforms()
+    if use_bottleneck and tr.bn is None:
+        pytest.skip('bottleneck is not installed')
+    if not use_bottleneck:
+        monkeypatch.setattr(tr, 'bn', None)
+
+    df = data_with_gaps()
+    result = tr.transform_regressors(df.to_numpy(dtype=np.float64), transform, option)
+    expected = pandas_transform(df, transform, option).to_numpy()
+
+    assert result.shape == expected.shape
+    np.testing.assert_allclose(result, expected, rtol=1e-10, atol=1e-12)
+
+
+def test_ffill_rows_leading_nans():
+    tr = load_transforms()
+    df = data_with_gaps()
+    np.testing.assert_array_equal(tr.ffill_rows(df.to_numpy()), df.ffill().to_numpy())